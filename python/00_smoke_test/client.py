@@ -13,17 +13,19 @@ PORT = 8080  # Server port
 class EchoClient:
     """A simple TCP client for the echo server."""
 
-    def __init__(self, host=HOST, port=PORT):
+    def __init__(self, host=HOST, port=PORT, verbose=True):
         """Initialize the client with host and port."""
         self.host = host
         self.port = port
+        self.verbose = verbose
         self.socket = None
 
     def connect(self):
         """Connect to the server."""
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.connect((self.host, self.port))
-        print(f"Connected to {self.host}:{self.port}")
+        if self.verbose:
+            print(f"Connected to {self.host}:{self.port}")
 
     def send(self, data):
         """Send data to the server.
@@ -34,7 +36,8 @@ class EchoClient:
         if isinstance(data, str):
             data = data.encode("utf-8")
         self.socket.sendall(data)
-        print(f"Sent: {data}")
+        if self.verbose:
+            print(f"Sent: {data}")
 
     def receive(self, buffer_size=4096):
         """Receive data from the server.
@@ -46,27 +49,54 @@ class EchoClient:
             Received data as bytes
         """
         data = self.socket.recv(buffer_size)
-        print(f"Received: {data}")
+        if self.verbose:
+            print(f"Received: {data}")
         return data
 
-    def send_and_receive(self, data, buffer_size=4096):
-        """Send data and receive the echo response.
+    def receive_exactly(self, n):
+        """Receive exactly n bytes from the server.
+
+        Args:
+            n: Number of bytes to receive
+
+        Returns:
+            Received data as bytes
+
+        Raises:
+            ConnectionError: If the server closes the connection early
+        """
+        buffer = bytearray(n)
+        view = memoryview(buffer)
+        total = 0
+        while total < n:
+            n_read = self.socket.recv_into(view[total:])
+            if n_read == 0:
+                raise ConnectionError(f"Connection closed after {total} of {n} bytes")
+            total += n_read
+        if self.verbose:
+            print(f"Received: {bytes(buffer)}")
+        return bytes(buffer)
+
+    def send_and_receive(self, data):
+        """Send data and receive the full echo response.
 
         Args:
             data: String or bytes to send
-            buffer_size: Maximum number of bytes to receive
 
         Returns:
             Received data as bytes
         """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
         self.send(data)
-        return self.receive(buffer_size)
+        return self.receive_exactly(len(data))
 
     def close(self):
         """Close the connection."""
         if self.socket:
             self.socket.close()
-            print("Connection closed")
+            if self.verbose:
+                print("Connection closed")
 
     def __enter__(self):
         """Context manager entry."""
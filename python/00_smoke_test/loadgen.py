@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Load Generator for the Echo Server
+Opens many concurrent EchoClient connections, pipelines fixed-size payloads
+over each one and reports throughput, round-trip times and byte-level
+correctness. Defaults to localhost so the server can be sized before deploying.
+"""
+
+import argparse
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+from client import EchoClient
+
+HOST = "127.0.0.1"  # Run against a local echo server by default
+PORT = 8080  # Server port
+
+SEQ_HEADER = struct.Struct("!II")  # (connection id, sequence number) prefix
+
+
+class Histogram:
+    """Power-of-two bucketed histogram of round-trip times in microseconds."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        micros = seconds * 1_000_000
+        bucket = max(int(micros), 1).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += micros
+        self.min = micros if self.min is None else min(self.min, micros)
+        self.max = micros if self.max is None else max(self.max, micros)
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p):
+        """Return the upper bound (in microseconds) of the bucket holding p."""
+        target = self.count * p / 100
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return 1 << bucket
+        return 0
+
+    def render(self, width=40):
+        lines = []
+        peak = max(self.buckets.values(), default=0)
+        for bucket in sorted(self.buckets):
+            count = self.buckets[bucket]
+            low = 0 if bucket == 1 else 1 << (bucket - 1)
+            bar = "#" * max(1, count * width // peak)
+            lines.append(f"  {low:>9} - {1 << bucket:>9} us | {count:>9} {bar}")
+        return "\n".join(lines)
+
+
+class ConnectionResult:
+    """Per-connection counters collected by a worker."""
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.messages = 0
+        self.bytes = 0
+        self.corrupt_messages = 0
+        self.corrupt_bytes = 0
+        self.error = None
+
+
+def make_payload(conn_id, seq, filler):
+    """Build a payload that is unique per (connection, sequence number)."""
+    return SEQ_HEADER.pack(conn_id, seq) + filler
+
+
+def run_connection(conn_id, args, filler, start_barrier, result):
+    """Drive one connection: a sender thread keeps up to `depth` payloads in
+    flight while this thread reads back exact-length echoes and checks them."""
+    size = SEQ_HEADER.size + len(filler)
+    in_flight = threading.Semaphore(args.depth)
+    sent_at = deque()
+
+    # Connect before the barrier so a refused connection still reaches it and
+    # the run goes ahead with the connections that worked
+    client = EchoClient(args.host, args.port, verbose=False)
+    try:
+        client.connect()
+    except OSError as e:
+        result.error = f"{type(e).__name__}: {e}"
+        client = None
+    start_barrier.wait()
+    if client is None:
+        return
+
+    def sender():
+        for seq in range(args.messages):
+            in_flight.acquire()
+            sent_at.append(time.perf_counter())
+            client.socket.sendall(make_payload(conn_id, seq, filler))
+
+    try:
+        sender_thread = threading.Thread(target=sender, daemon=True)
+        sender_thread.start()
+
+        for seq in range(args.messages):
+            data = client.receive_exactly(size)
+            result.histogram.add(time.perf_counter() - sent_at.popleft())
+            in_flight.release()
+
+            expected = make_payload(conn_id, seq, filler)
+            if data != expected:
+                result.corrupt_messages += 1
+                result.corrupt_bytes += sum(
+                    1 for got, want in zip(data, expected) if got != want
+                )
+            result.messages += 1
+            result.bytes += size
+
+        sender_thread.join()
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        client.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument(
+        "-c", "--connections", type=int, default=50, help="concurrent connections"
+    )
+    parser.add_argument(
+        "-n", "--messages", type=int, default=1000, help="messages per connection"
+    )
+    parser.add_argument(
+        "-s", "--size", type=int, default=1024, help="payload size in bytes"
+    )
+    parser.add_argument(
+        "-d", "--depth", type=int, default=8, help="pipelined messages in flight"
+    )
+    args = parser.parse_args()
+    if args.size < SEQ_HEADER.size:
+        parser.error(f"--size must be at least {SEQ_HEADER.size} bytes")
+    if args.depth < 1:
+        parser.error("--depth must be at least 1")
+    return args
+
+
+def main():
+    args = parse_args()
+    filler = os.urandom(args.size - SEQ_HEADER.size)
+
+    results = [ConnectionResult() for _ in range(args.connections)]
+    start_barrier = threading.Barrier(args.connections + 1)
+    workers = [
+        threading.Thread(
+            target=run_connection,
+            args=(conn_id, args, filler, start_barrier, results[conn_id]),
+            daemon=True,
+        )
+        for conn_id in range(args.connections)
+    ]
+    for worker in workers:
+        worker.start()
+
+    start_barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    histogram = Histogram()
+    for result in results:
+        histogram.merge(result.histogram)
+    messages = sum(result.messages for result in results)
+    total_bytes = sum(result.bytes for result in results)
+    corrupt_messages = sum(result.corrupt_messages for result in results)
+    corrupt_bytes = sum(result.corrupt_bytes for result in results)
+    errors = [(i, r.error) for i, r in enumerate(results) if r.error]
+
+    print(
+        f"{args.connections} connections x {args.messages} messages x "
+        f"{args.size} bytes, depth {args.depth} -> {args.host}:{args.port}"
+    )
+    print(f"Elapsed:     {elapsed:.3f}s")
+    if elapsed > 0:
+        print(
+            f"Throughput:  {messages / elapsed:,.0f} msg/s, "
+            f"{total_bytes / elapsed / 1_000_000:,.2f} MB/s echoed"
+        )
+    if histogram.count:
+        print(
+            f"RTT (us):    min {histogram.min:.0f}  "
+            f"mean {histogram.total / histogram.count:.0f}  "
+            f"p50 <{histogram.percentile(50)}  p99 <{histogram.percentile(99)}  "
+            f"max {histogram.max:.0f}"
+        )
+        print(histogram.render())
+    print(
+        f"Correctness: {messages - corrupt_messages}/{messages} messages intact, "
+        f"{corrupt_bytes} corrupt bytes"
+    )
+    for conn_id, error in errors:
+        print(f"Connection {conn_id} failed: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,24 @@ Listens for client connections and echoes back any data received.
 Handles multiple clients concurrently using threading.
 """
 
+import os
 import socket
 import sys
 import threading
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import capture, log, profiling
+
+logger = log.get_logger("echo")
+
 HOST = '0.0.0.0'  # Listen on all available interfaces
 PORT = 8080       # Port to listen on
 
 def main():
+    log.setup()
+    profiling.install()
+    capture.install()
+
     # Create a TCP socket
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
         # Allow reuse of address to avoid "Address already in use" errors
@@ -23,13 +33,13 @@ def main():
 
         # Start listening for connections (backlog of 128)
         server_socket.listen(128)
-        print(f"TCP Server listening on {HOST}:{PORT}")
+        logger.info("TCP Server listening on %s:%s", HOST, PORT)
 
         try:
             while True:
                 # Accept a client connection
                 client_socket, client_address = server_socket.accept()
-                print(f"Connection from {client_address}")
+                logger.info("Connection from %s", client_address)
 
                 # Handle the client in a separate thread for concurrent serving
                 client_thread = threading.Thread(
@@ -39,11 +49,13 @@ def main():
                 )
                 client_thread.start()
         except KeyboardInterrupt:
-            print("\nShutting down server...")
+            logger.info("Shutting down server...")
             sys.exit(0)
 
 def handle_client(client_socket, client_address):
     """Handle a single client connection."""
+    client_socket = capture.wrap_socket(client_socket)
+    conn_log = log.for_connection(logger, client_address)
     try:
         with client_socket:
             while True:
@@ -52,15 +64,15 @@ def handle_client(client_socket, client_address):
 
                 # If no data received, client has closed the connection
                 if not data:
-                    print(f"Client {client_address} disconnected")
+                    conn_log.info("Client %s disconnected", client_address)
                     break
 
-                print(f"Received from {client_address}: {data[:100]}")  # Print first 100 bytes
+                conn_log.debug("Received from %s: %.100r", client_address, data)  # First 100 chars
 
                 # Echo the data back to the client
                 client_socket.sendall(data)
     except Exception as e:
-        print(f"Error handling client {client_address}: {e}")
+        conn_log.error("Error handling client %s: %s", client_address, e)
 
 if __name__ == "__main__":
     main()
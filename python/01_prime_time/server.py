@@ -6,15 +6,25 @@ Handles multiple clients concurrently using threading.
 """
 
 import json
+import os
 import socket
 import sys
 import threading
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import capture, log, profiling
+
+logger = log.get_logger("prime_time")
+
 HOST = "0.0.0.0"  # Listen on all available interfaces
 PORT = 8080  # Port to listen on
 
 
 def main():
+    log.setup()
+    profiling.install()
+    capture.install()
+
     # Create a TCP socket
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
         # Allow reuse of address to avoid "Address already in use" errors
@@ -25,13 +35,13 @@ def main():
 
         # Start listening for connections (backlog of 128)
         server_socket.listen(128)
-        print(f"TCP Server listening on {HOST}:{PORT}")
+        logger.info("TCP Server listening on %s:%s", HOST, PORT)
 
         try:
             while True:
                 # Accept a client connection
                 client_socket, client_address = server_socket.accept()
-                print(f"Connection from {client_address}")
+                logger.info("Connection from %s", client_address)
 
                 # Handle the client in a separate thread for concurrent serving
                 client_thread = threading.Thread(
@@ -41,12 +51,14 @@ def main():
                 )
                 client_thread.start()
         except KeyboardInterrupt:
-            print("\nShutting down server...")
+            logger.info("Shutting down server...")
             sys.exit(0)
 
 
 def handle_client(client_socket, client_address):
     """Handle a single client connection."""
+    client_socket = capture.wrap_socket(client_socket)
+    conn_log = log.for_connection(logger, client_address)
     the_rest = ""
     try:
         with client_socket:
@@ -56,31 +68,28 @@ def handle_client(client_socket, client_address):
 
                 # If no data received, client has closed the connection
                 if not data:
-                    print(f"Client {client_address} disconnected")
+                    conn_log.info("Client %s disconnected", client_address)
                     break
-                print("----------------------------------")
-                print(
-                    f"Received from {client_address}: {data}"
-                )  # Print first 100 bytes
+                conn_log.debug("Received from %s: %r", client_address, data)
 
                 request_string = data.decode("utf-8")
                 request_string = the_rest + request_string
 
                 request_items = request_string.split("\n")
                 for each_request in request_items[:-1]:
-                    handle_request(each_request, client_socket)
+                    handle_request(each_request, client_socket, conn_log)
 
                 the_rest = request_items[-1]
 
     #
     except Exception as e:
-        print(f"Error handling client {client_address}: {e}")
+        conn_log.error("Error handling client %s: %s", client_address, e)
 
 
-def handle_request(request_string, client_socket):
+def handle_request(request_string, client_socket, conn_log=logger):
     try:
         json_object = json.loads(request_string)
-        print("JSON", json_object)
+        conn_log.debug("JSON %s", json_object)
         if is_invalid(json_object):
             response = b"malformed\n"
         else:
@@ -95,7 +104,7 @@ def handle_request(request_string, client_socket):
     except:
         response = (request_string + "\n").encode("utf-8")
 
-    print("RESPONSE", response)
+    conn_log.debug("RESPONSE %r", response)
     client_socket.sendall(response)
 
 
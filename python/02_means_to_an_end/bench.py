@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Price Store Benchmark
+Fills one session's PriceStore with 1M shuffled inserts and measures range-mean
+query latency, next to the linear scan the Go server does for every query.
+"""
+
+import argparse
+import random
+import time
+
+import prices
+from prices import PriceStore
+
+
+def linear_mean(rows, mintime, maxtime):
+    """The Go server's getMeanBetween: scan every insert on each query."""
+    total = 0
+    count = 0
+    for timestamp, price in rows:
+        if mintime <= timestamp <= maxtime:
+            total += price
+            count += 1
+    if count == 0:
+        return 0
+    # int64 division in Go truncates towards zero
+    mean = abs(total) // count
+    return mean if total >= 0 else -mean
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    mean = sum(samples) / len(samples)
+    print(
+        f"{name:<18} mean {mean * 1e6:9.2f} us  p50 {percentile(samples, 50) * 1e6:9.2f} us"
+        f"  p99 {percentile(samples, 99) * 1e6:9.2f} us  ({len(samples)} queries)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--inserts", type=int, default=1_000_000)
+    parser.add_argument("-q", "--queries", type=int, default=10_000)
+    parser.add_argument(
+        "--linear-queries", type=int, default=20, help="queries for the scan baseline"
+    )
+    parser.add_argument(
+        "--no-numpy", action="store_true", help="force the pure Python merge path"
+    )
+    args = parser.parse_args()
+
+    if args.no_numpy:
+        prices.np = None
+    print(f"NumPy merge path: {'on' if prices.np is not None else 'off'}")
+
+    rng = random.Random(0)
+    timestamps = list(range(args.inserts))
+    rng.shuffle(timestamps)
+    values = [rng.randint(-(2**31), 2**31 - 1) for _ in timestamps]
+
+    store = PriceStore()
+    started = time.perf_counter()
+    store.insert_many(timestamps, values)
+    insert_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    store.mean(0, 0)  # the first query merges every buffered insert
+    merge_time = time.perf_counter() - started
+    print(
+        f"{args.inserts:,} inserts buffered in {insert_time:.3f}s, merged in {merge_time:.3f}s"
+    )
+
+    ranges = []
+    for _ in range(args.queries):
+        low, high = sorted(rng.randrange(args.inserts) for _ in range(2))
+        ranges.append((low, high))
+
+    samples = []
+    for low, high in ranges:
+        started = time.perf_counter()
+        store.mean(low, high)
+        samples.append(time.perf_counter() - started)
+    report("PriceStore", samples)
+
+    rows = list(zip(timestamps, values))
+    samples = []
+    for low, high in ranges[: args.linear_queries]:
+        started = time.perf_counter()
+        expected = linear_mean(rows, low, high)
+        samples.append(time.perf_counter() - started)
+        assert store.mean(low, high) == expected, (low, high)
+    report("Linear scan", samples)
+
+    # One more out-of-order insert per query, the worst case for the merge
+    samples = []
+    for low, high in ranges[:1000]:
+        store.insert(rng.randrange(args.inserts), rng.randint(-1000, 1000))
+        started = time.perf_counter()
+        store.mean(low, high)
+        samples.append(time.perf_counter() - started)
+    report("Insert + query", samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Per-session price store for Means to an End.
+
+Prices are kept in compact `array` columns sorted by timestamp, next to a
+running prefix sum, so the mean over [mintime, maxtime] is two binary searches
+and a subtraction: O(log n) per query instead of a scan over every insert.
+
+Inserts are buffered and merged lazily on the next query. In-order inserts
+(the common case) are simply appended; out-of-order ones only rewrite the tail
+that follows the earliest new timestamp, with each new row placed by binary
+search. Large merges go through NumPy when it is installed and fall back to
+pure Python otherwise.
+
+So a query is O(log n) only once the buffer is empty. The first query after an
+out-of-order insert pays O(n) to rewrite the tail and its prefix sums. In
+bench.py at 1M rows that costs about 9 ms per query with NumPy and about 125 ms
+without, against about 5 us for a query with nothing pending.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure Python path is used instead
+    np = None
+
+NUMPY_MERGE_THRESHOLD = 4096  # rows to merge before NumPy beats pure Python
+INSORT_LIMIT = 64  # pending inserts slotted in one by one before sorting instead
+
+
+class PriceStore:
+    """Timestamp-sorted prices with prefix sums for O(log n) range means."""
+
+    def __init__(self):
+        self.timestamps = array("i")
+        self.prices = array("i")
+        self.prefix = array("q", [0])  # prefix[i] = sum of the first i prices
+        self._pending_timestamps = array("i")
+        self._pending_prices = array("i")
+
+    def __len__(self):
+        return len(self.timestamps) + len(self._pending_timestamps)
+
+    def insert(self, timestamp: int, price: int):
+        self._pending_timestamps.append(timestamp)
+        self._pending_prices.append(price)
+
+    def insert_many(self, timestamps, prices):
+        """Buffer a batch of inserts; accepts lists, arrays or NumPy arrays."""
+        if np is not None and isinstance(timestamps, np.ndarray):
+            timestamps = timestamps.astype(np.int32, copy=False).tobytes()
+            prices = np.asarray(prices).astype(np.int32, copy=False).tobytes()
+            self._pending_timestamps.frombytes(timestamps)
+            self._pending_prices.frombytes(prices)
+        else:
+            self._pending_timestamps.extend(timestamps)
+            self._pending_prices.extend(prices)
+
+    def mean(self, mintime: int, maxtime: int) -> int:
+        """Mean price over mintime <= timestamp <= maxtime, 0 if none."""
+        self._flush()
+        if mintime > maxtime:
+            return 0
+        start = bisect_left(self.timestamps, mintime)
+        end = bisect_right(self.timestamps, maxtime)
+        count = end - start
+        if count == 0:
+            return 0
+        total = self.prefix[end] - self.prefix[start]
+        # Truncate towards zero like the Go implementation's int64 division
+        mean = abs(total) // count
+        return mean if total >= 0 else -mean
+
+    def _flush(self):
+        if not self._pending_timestamps:
+            return
+
+        pending_timestamps = self._pending_timestamps
+        pending_prices = self._pending_prices
+        self._pending_timestamps = array("i")
+        self._pending_prices = array("i")
+
+        first = min(pending_timestamps)
+        if not self.timestamps or first > self.timestamps[-1]:
+            start = len(self.timestamps)
+        else:
+            start = bisect_right(self.timestamps, first)
+
+        rows = len(self.timestamps) - start + len(pending_timestamps)
+        if np is not None and rows >= NUMPY_MERGE_THRESHOLD:
+            merge = self._merge_numpy
+        else:
+            merge = self._merge_python
+        timestamps, prices, prefix = merge(start, pending_timestamps, pending_prices)
+
+        del self.timestamps[start:], self.prices[start:], self.prefix[start + 1 :]
+        self.timestamps.frombytes(timestamps)
+        self.prices.frombytes(prices)
+        self.prefix.frombytes(prefix)
+
+    def _merge_python(self, start, pending_timestamps, pending_prices):
+        timestamps = self.timestamps[start:]
+        prices = self.prices[start:]
+        if len(pending_timestamps) <= INSORT_LIMIT:
+            # A few stragglers: slot each one in after any equal timestamps
+            for timestamp, price in sorted(zip(pending_timestamps, pending_prices)):
+                index = bisect_right(timestamps, timestamp)
+                timestamps.insert(index, timestamp)
+                prices.insert(index, price)
+        else:
+            # Stable sort keeps earlier inserts first among equal timestamps
+            rows = sorted(
+                zip(timestamps + pending_timestamps, prices + pending_prices),
+                key=lambda row: row[0],
+            )
+            timestamps = array("i", (row[0] for row in rows))
+            prices = array("i", (row[1] for row in rows))
+        prefix = array("q", accumulate(prices, initial=self.prefix[start]))
+        return timestamps.tobytes(), prices.tobytes(), prefix[1:].tobytes()
+
+    def _merge_numpy(self, start, pending_timestamps, pending_prices):
+        # Views over the stored arrays must be gone before they are resized,
+        # so everything is handed back as bytes
+        timestamps = np.frombuffer(self.timestamps, np.int32)[start:]
+        prices = np.frombuffer(self.prices, np.int32)[start:]
+        new_timestamps = np.frombuffer(pending_timestamps, np.int32)
+        new_prices = np.frombuffer(pending_prices, np.int32)
+
+        order = np.argsort(new_timestamps, kind="stable")
+        new_timestamps = new_timestamps[order]
+        new_prices = new_prices[order]
+        positions = np.searchsorted(timestamps, new_timestamps, side="right")
+        timestamps = np.insert(timestamps, positions, new_timestamps)
+        prices = np.insert(prices, positions, new_prices)
+
+        prefix = np.cumsum(prices, dtype=np.int64) + self.prefix[start]
+        return timestamps.tobytes(), prices.tobytes(), prefix.tobytes()
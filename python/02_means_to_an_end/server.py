@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Means to an End Server
+Each client session inserts timestamped prices and queries the mean price
+over a time range, using 9-byte binary messages.
+Handles multiple clients concurrently using threading.
+"""
+
+import os
+import socket
+import struct
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import capture, log, profiling
+
+from prices import PriceStore
+
+logger = log.get_logger("means_to_an_end")
+
+HOST = "0.0.0.0"  # Listen on all available interfaces
+PORT = 8080  # Port to listen on
+
+MESSAGE = struct.Struct("!cii")  # type, then two big-endian int32s
+RESPONSE = struct.Struct("!i")
+
+
+def main():
+    log.setup()
+    profiling.install()
+    capture.install()
+
+    # Create a TCP socket
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
+        # Allow reuse of address to avoid "Address already in use" errors
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        # Bind to the address and port
+        server_socket.bind((HOST, PORT))
+
+        # Start listening for connections (backlog of 128)
+        server_socket.listen(128)
+        logger.info("TCP Server listening on %s:%s", HOST, PORT)
+
+        try:
+            while True:
+                # Accept a client connection
+                client_socket, client_address = server_socket.accept()
+                logger.info("Connection from %s", client_address)
+
+                # Handle the client in a separate thread for concurrent serving
+                client_thread = threading.Thread(
+                    target=handle_client,
+                    args=(client_socket, client_address),
+                    daemon=True,
+                )
+                client_thread.start()
+        except KeyboardInterrupt:
+            logger.info("Shutting down server...")
+            sys.exit(0)
+
+
+def handle_client(client_socket, client_address):
+    """Handle a single client connection."""
+    client_socket = capture.wrap_socket(client_socket)
+    conn_log = log.for_connection(logger, client_address)
+    store = PriceStore()
+    data_buffer = b""
+    try:
+        with client_socket:
+            while True:
+                # Receive data from the client (up to 4096 bytes)
+                data = client_socket.recv(4096)
+
+                # If no data received, client has closed the connection
+                if not data:
+                    conn_log.info("Client %s disconnected", client_address)
+                    break
+                conn_log.debug("Received from %s: %s", client_address, log.Hex(data))
+
+                data_buffer += data
+                complete = len(data_buffer) - len(data_buffer) % MESSAGE.size
+                responses, ok = handle_messages(data_buffer[:complete], store)
+                data_buffer = data_buffer[complete:]
+
+                if responses:
+                    client_socket.sendall(b"".join(responses))
+                if not ok:
+                    conn_log.info("Invalid message from %s, closing", client_address)
+                    break
+    except Exception as e:
+        conn_log.error("Error handling client %s: %s", client_address, e)
+
+
+def handle_messages(data, store):
+    """Apply every complete message in data to the store.
+
+    Runs of inserts are handed to the store as one batch.
+
+    Returns:
+        (responses, ok): encoded query responses, and False if an unknown
+        message type was seen (the rest of data is then ignored)
+    """
+    responses = []
+    timestamps = []
+    prices = []
+    for kind, first, second in MESSAGE.iter_unpack(data):
+        if kind == b"I":
+            timestamps.append(first)
+            prices.append(second)
+            continue
+
+        if timestamps:
+            store.insert_many(timestamps, prices)
+            timestamps, prices = [], []
+
+        if kind == b"Q":
+            responses.append(RESPONSE.pack(store.mean(first, second)))
+        else:
+            return responses, False
+
+    if timestamps:
+        store.insert_many(timestamps, prices)
+    return responses, True
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
+import logging
 import socket
 
 from messages import parse_u32
 
+logger = logging.getLogger("authority")
+
 HOST = "pestcontrol.protohackers.com"  # Server hostname or IP address
 PORT = 20547  # Server port
 
@@ -20,18 +23,37 @@ class AuthorityServerClient:
         """Connect to the server."""
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.connect((self.host, self.port))
-        print(f"Connected to {self.host}:{self.port}")
+        logger.debug("Connected to %s:%s", self.host, self.port)
 
     def send(self, data):
         """Send data to the server.
 
         Args:
-            data: String or bytes to send
+            data: String, bytes, or a list of buffers such as a message's parts
         """
+        if isinstance(data, list):
+            self.send_many(data)
+            return
         if isinstance(data, str):
             data = data.encode("utf-8")
         self.socket.sendall(data)
-        print(f"Sent: {data}")
+        logger.debug("Sent: %r", data)
+
+    def send_many(self, buffers):
+        """Send several buffers in one vectored write.
+
+        Args:
+            buffers: List of bytes, sent back to back without being joined
+        """
+        logger.debug("Sent: %r", buffers)
+        buffers = [memoryview(buffer) for buffer in buffers]
+        while buffers:
+            sent = self.socket.sendmsg(buffers)
+            # Drop what went out and resume from a partially sent buffer
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers.pop(0))
+            if sent:
+                buffers[0] = buffers[0][sent:]
 
     def receive(self):
         """Receive data from the server.
@@ -46,7 +68,7 @@ class AuthorityServerClient:
             if len(self.data_buffer) < 5:
                 data = self.socket.recv(4096)
                 self.data_buffer += data
-                print(f"Received: {data}")
+                logger.debug("Received: %r", data)
                 continue
 
             message_len, _ = parse_u32(self.data_buffer, 1)
@@ -54,7 +76,7 @@ class AuthorityServerClient:
             if len(self.data_buffer) < message_len:
                 data = self.socket.recv(4096)
                 self.data_buffer += data
-                print(f"Received: {data}")
+                logger.debug("Received: %r", data)
                 continue
 
             message = self.data_buffer[:message_len]
@@ -65,4 +87,4 @@ class AuthorityServerClient:
         """Close the connection."""
         if self.socket:
             self.socket.close()
-            print("Connection closed")
+            logger.debug("Connection closed")
@@ -1,46 +1,58 @@
+import logging
+import struct
+
+logger = logging.getLogger("messages")
+
+
+U32 = struct.Struct("!I")
+HEADER = struct.Struct("!cI")  # message type, total message length
+
+
 def encode_u32(n: int) -> bytes:
     assert 0 <= n <= (2**32 - 1), f"u32 out of range: {n}"
-    return bytes([(n >> 24) % 256, (n >> 16) % 256, (n >> 8) % 256, n % 256])
+    return U32.pack(n)
 
 
 def encode_str(s: str) -> bytes:
     return encode_u32(len(s)) + s.encode("utf-8")
 
 
-def message_wrapper(message_type: bytes, contents: bytes) -> bytes:
+def message_parts(message_type: bytes, *fields: bytes) -> list[bytes]:
+    """Frame fields as [header, *fields, checksum] without joining them.
+
+    The message builders below all return such lists, so they can go straight
+    to `socket.sendmsg` or `writer.writelines` without a copy.
+    """
     assert len(message_type) == 1, (
         f"message_type must be 1 byte, got {len(message_type)}"
     )
-    message_len = len(contents) + 1 + 4 + 1
-    message = message_type + encode_u32(message_len) + contents
-    checksum = 0
-    for val in message:
-        checksum -= val
-    checksum %= 256
-    return message + bytes([checksum])
+    message_len = HEADER.size + sum(map(len, fields)) + 1
+    header = HEADER.pack(message_type, message_len)
+    checksum = -(sum(header) + sum(map(sum, fields))) % 256
+    return [header, *fields, bytes((checksum,))]
 
 
-def hello_message(protocol: str, version: int) -> bytes:
-    return message_wrapper(b"\x50", encode_str(protocol) + encode_u32(version))
+def hello_message(protocol: str, version: int) -> list[bytes]:
+    return message_parts(b"\x50", encode_str(protocol), encode_u32(version))
 
 
-def error_message(message: str) -> bytes:
-    print(f"{message=}")
-    return message_wrapper(b"\x51", encode_str(message))
+def error_message(message: str) -> list[bytes]:
+    logger.debug("error_message: %s", message)
+    return message_parts(b"\x51", encode_str(message))
 
 
-def dial_authority_message(site: int) -> bytes:
-    return message_wrapper(b"\x53", encode_u32(site))
+def dial_authority_message(site: int) -> list[bytes]:
+    return message_parts(b"\x53", encode_u32(site))
 
 
-def create_policy_message(species: str, action: bytes) -> bytes:
+def create_policy_message(species: str, action: bytes) -> list[bytes]:
     assert len(action) == 1, f"action must be 1 byte, got {len(action)}"
     assert action in (b"\x90", b"\xa0"), f"action must be 0x90 or 0xA0, got {action!r}"
-    return message_wrapper(b"\x55", encode_str(species) + action)
+    return message_parts(b"\x55", encode_str(species), action)
 
 
-def delete_policy_message(policy: int) -> bytes:
-    return message_wrapper(b"\x56", encode_u32(policy))
+def delete_policy_message(policy: int) -> list[bytes]:
+    return message_parts(b"\x56", encode_u32(policy))
 
 
 def parse_u32(b: bytes, index: int) -> tuple[int, int]:
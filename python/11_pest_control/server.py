@@ -6,20 +6,44 @@ Handles multiple clients concurrently using asyncio.
 """
 
 import asyncio
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import capture, log, profiling
+
 from client import AuthorityServerClient
 from messages import *
 
+logger = log.get_logger("pest_control")
+
 HOST = "0.0.0.0"  # Listen on all available interfaces
 PORT = 8080  # Port to listen on
 
 all_policies: dict[
     int, dict[str, tuple[int, str]]
 ] = {}  # maps from site id to another dictionary of species to (policy id, cull/conserve)
+site_targets: dict[
+    int, list[dict[str, int | str]]
+] = {}  # maps from site id to the target populations the authority sent for it
+site_bands: dict[
+    int, dict[str, str]
+] = {}  # maps from site id to species to "below"/"within"/"above" at the last visit
+
+# policy each band calls for; "within" means no policy
+BAND_POLICIES = {"below": "conserve", "within": None, "above": "cull"}
+# CreatePolicy action byte for each policy
+POLICY_ACTIONS = {"conserve": b"\xa0", "cull": b"\x90"}
+
+counters = {"visits_without_authority": 0}
+COUNTER_LOG_INTERVAL = 60  # seconds between counter reports in the log
 
 
 async def main():
+    log.setup()
+    profiling.install()
+    capture.install()
+
     # Create async TCP server
     server = await asyncio.start_server(
         handle_client,
@@ -28,16 +52,26 @@ async def main():
     )
 
     addr = server.sockets[0].getsockname()
-    print(f"TCP Server listening on {addr[0]}:{addr[1]}")
+    logger.info("TCP Server listening on %s:%s", addr[0], addr[1])
+
+    # Keep a reference so the reporting task isn't garbage collected
+    reporter = asyncio.create_task(report_counters())
 
     async with server:
         try:
             await server.serve_forever()
         except KeyboardInterrupt:
-            print("\nShutting down server...")
+            logger.info("Shutting down server...")
             sys.exit(0)
 
 
+async def report_counters():
+    """Log the server counters every COUNTER_LOG_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(COUNTER_LOG_INTERVAL)
+        logger.info("counters %s", counters)
+
+
 def validate_checksum(message: bytes) -> bool:
     checksum_total = 0
     for val in message:
@@ -45,19 +79,48 @@ def validate_checksum(message: bytes) -> bool:
     return checksum_total % 256 == 0
 
 
-def process_message(message: bytes, writer, state):
-    print(f"process_message: len={len(message)} type={message[:1].hex()} state={state}")
+def classify_site_visit(
+    species_count: dict[str, int], targets: list[dict[str, int | str]]
+) -> dict[str, str]:
+    """Place each target species below, within or above its target range."""
+    bands = {}
+    for target_population in targets:
+        count = species_count.get(target_population["species"], 0)
+        if count < target_population["min"]:
+            bands[target_population["species"]] = "below"
+        elif count > target_population["max"]:
+            bands[target_population["species"]] = "above"
+        else:
+            bands[target_population["species"]] = "within"
+    return bands
+
+
+def policies_match(site: int, bands: dict[str, str]) -> bool:
+    """Whether the tracked policies for site are already what bands call for."""
+    policies = all_policies[site]
+    for species, band in bands.items():
+        current = policies[species][1] if species in policies else None
+        if current != BAND_POLICIES[band]:
+            return False
+    return True
+
+
+def process_message(message: bytes, outbox: list[bytes], state, conn_log=logger):
+    """Handle one complete client message, queueing reply parts on outbox."""
+    conn_log.debug(
+        "process_message: len=%d type=%02x state=%s", len(message), message[0], state
+    )
     # 1. check that the checksum is valid
     # if checksum is invalid, then send back error
 
     try:
         if not state["server_hello"]:
-            writer.write(hello_message("pestcontrol", 1))
+            outbox.extend(hello_message("pestcontrol", 1))
             state["server_hello"] = True
 
         if not validate_checksum(message):
-            print("process_message: checksum invalid")
-            writer.write(error_message("Checksum failed"))
+            conn_log.info("process_message: checksum invalid")
+            outbox.extend(error_message("Checksum failed"))
             return
 
         # 2. parse the message type
@@ -65,22 +128,22 @@ def process_message(message: bytes, writer, state):
         if message[:1] == b"\x50":
             # process hello
             res = parse_hello_message(message)
-            print(f"process_message: hello parsed {res}")
+            conn_log.debug("process_message: hello parsed %s", res)
             if res["protocol"] != "pestcontrol" or res["version"] != 1:
-                print("process_message: hello protocol/version mismatch")
-                writer.write(error_message("Invalid hello"))
+                conn_log.info("process_message: hello protocol/version mismatch")
+                outbox.extend(error_message("Invalid hello"))
                 return
             state["client_hello"] = True
             return
 
         if not state["client_hello"]:
-            print("process_message: received non-hello before hello")
-            writer.write(error_message("Missing hello as first message"))
+            conn_log.info("process_message: received non-hello before hello")
+            outbox.extend(error_message("Missing hello as first message"))
             return
 
         if message[:1] == b"\x58":
             res = parse_site_visit_message(message)
-            print(f"process_message: site visit parsed {res}")
+            conn_log.debug("process_message: site visit parsed %s", res)
 
             site = res["site"]
             populations = res["populations"]
@@ -94,7 +157,7 @@ def process_message(message: bytes, writer, state):
                 else:
                     bad = True
             if bad:
-                writer.write(
+                outbox.extend(
                     error_message("Multiple conflicting counts for the same species")
                 )
                 return
@@ -102,19 +165,33 @@ def process_message(message: bytes, writer, state):
             if site not in all_policies:
                 all_policies[site] = {}
 
+            # A visit that lands in the same bands as the last one, with the
+            # policies already in place, needs no authority session at all
+            if site in site_targets:
+                bands = classify_site_visit(species_count, site_targets[site])
+                if bands == site_bands.get(site) and policies_match(site, bands):
+                    counters["visits_without_authority"] += 1
+                    conn_log.debug(
+                        "process_message: site %d unchanged, skipping authority", site
+                    )
+                    return
+
             # 1. create a new AuthorityServerClient client
-            print(f"process_message: connecting to authority for site {site}")
+            conn_log.debug("process_message: connecting to authority for site %d", site)
             authority_server_client = AuthorityServerClient()
             authority_server_client.connect()
 
             try:
-                # 2. send Hello and receive Hello
+                # 2. send Hello and DialAuthority together (saves a round trip), receive Hello
                 # TODO: remember to handle exceptions properly by sending the error message on exception
-                authority_server_client.send(hello_message("pestcontrol", 1))
+                authority_server_client.send_many(
+                    [*hello_message("pestcontrol", 1), *dial_authority_message(site)]
+                )
                 authority_hello_message = authority_server_client.receive()
-                print(
-                    "process_message: authority hello "
-                    f"type={authority_hello_message[:1].hex()} len={len(authority_hello_message)}"
+                conn_log.debug(
+                    "process_message: authority hello type=%02x len=%d",
+                    authority_hello_message[0],
+                    len(authority_hello_message),
                 )
                 if not validate_checksum(authority_hello_message):
                     authority_server_client.send(
@@ -129,12 +206,12 @@ def process_message(message: bytes, writer, state):
                     authority_server_client.send(error_message("Invalid hello"))
                     return
 
-                # 3. send DialAuthority and receive TargetPopulations
-                authority_server_client.send(dial_authority_message(site))
+                # 3. receive TargetPopulations for the DialAuthority sent above
                 target_populations_message = authority_server_client.receive()
-                print(
-                    "process_message: authority target populations "
-                    f"type={target_populations_message[:1].hex()} len={len(target_populations_message)}"
+                conn_log.debug(
+                    "process_message: authority target populations type=%02x len=%d",
+                    target_populations_message[0],
+                    len(target_populations_message),
                 )
                 if not validate_checksum(target_populations_message):
                     authority_server_client.send(
@@ -148,114 +225,61 @@ def process_message(message: bytes, writer, state):
                 )
                 target_populations = authority_server_res["populations"]
 
-                # 4. iterate over populations and update policies
-                for target_population in target_populations:
-                    species = target_population["species"]
-                    min_count = target_population["min"]
-                    max_count = target_population["max"]
-
-                    cur_count = species_count.get(species, 0)
-                    if cur_count < min_count:
-                        # delete policy if there's an existing policy and it's cull
-                        if (
-                            species in all_policies[site]
-                            and all_policies[site][species][1] == "cull"
-                        ):
-                            # remove policy
-                            authority_server_client.send(
-                                delete_policy_message(all_policies[site][species][0])
-                            )
-                            ok_message = authority_server_client.receive()
-                            if not validate_checksum(ok_message):
-                                authority_server_client.send(
-                                    error_message(
-                                        "Bad checksum for authority server ok"
-                                    )
-                                )
-                                return
-                            del all_policies[site][species]
-
-                        # add policy if there's no existing conserve policy
-                        if species not in all_policies[site]:
-                            # add policy
-                            authority_server_client.send(
-                                create_policy_message(species, b"\xa0")
-                            )
-                            policy_result_message = authority_server_client.receive()
-                            if not validate_checksum(policy_result_message):
-                                authority_server_client.send(
-                                    error_message("Bad checksum")
-                                )
-                                return
-                            policy_id = parse_policy_result_message(
-                                policy_result_message
-                            )["policy"]
-
-                            all_policies[site][species] = (policy_id, "conserve")
-                    elif cur_count > max_count:
-                        # delete policy if there's an existing policy and it's conserve
-                        if (
-                            species in all_policies[site]
-                            and all_policies[site][species][1] == "conserve"
-                        ):
-                            # remove policy
-                            authority_server_client.send(
-                                delete_policy_message(all_policies[site][species][0])
-                            )
-                            ok_message = authority_server_client.receive()
-                            if not validate_checksum(ok_message):
-                                authority_server_client.send(
-                                    error_message(
-                                        "Bad checksum for authority server ok"
-                                    )
-                                )
-                                return
-                            del all_policies[site][species]
-
-                        # add policy if there's no existing cull policy
-                        if species not in all_policies[site]:
-                            # add policy
-                            authority_server_client.send(
-                                create_policy_message(species, b"\x90")
-                            )
-                            policy_result_message = authority_server_client.receive()
-                            if not validate_checksum(policy_result_message):
-                                authority_server_client.send(
-                                    error_message("Bad checksum")
-                                )
-                                return
-                            policy_id = parse_policy_result_message(
-                                policy_result_message
-                            )["policy"]
-
-                            all_policies[site][species] = (policy_id, "cull")
-                    else:
-                        if species in all_policies[site]:
-                            # remove policy
+                # 4. bring each species' policy in line with its band
+                bands = classify_site_visit(species_count, target_populations)
+                for species, band in bands.items():
+                    wanted = BAND_POLICIES[band]
+
+                    # delete the existing policy if the band calls for another one
+                    if (
+                        species in all_policies[site]
+                        and all_policies[site][species][1] != wanted
+                    ):
+                        # remove policy
+                        authority_server_client.send(
+                            delete_policy_message(all_policies[site][species][0])
+                        )
+                        ok_message = authority_server_client.receive()
+                        if not validate_checksum(ok_message):
                             authority_server_client.send(
-                                delete_policy_message(all_policies[site][species][0])
+                                error_message("Bad checksum for authority server ok")
                             )
-                            ok_message = authority_server_client.receive()
-                            if not validate_checksum(ok_message):
-                                authority_server_client.send(
-                                    error_message(
-                                        "Bad checksum for authority server ok"
-                                    )
-                                )
-                                return
-                            del all_policies[site][species]
+                            return
+                        del all_policies[site][species]
+
+                    # add the policy the band calls for if there isn't one
+                    if wanted is not None and species not in all_policies[site]:
+                        # add policy
+                        authority_server_client.send(
+                            create_policy_message(species, POLICY_ACTIONS[wanted])
+                        )
+                        policy_result_message = authority_server_client.receive()
+                        if not validate_checksum(policy_result_message):
+                            authority_server_client.send(error_message("Bad checksum"))
+                            return
+                        policy_id = parse_policy_result_message(policy_result_message)[
+                            "policy"
+                        ]
+
+                        all_policies[site][species] = (policy_id, wanted)
+
+                # 5. remember the targets and bands the policies now reflect
+                site_targets[site] = target_populations
+                site_bands[site] = bands
             except Exception as e:
                 authority_server_client.send(error_message("Exception occurred"))
 
             authority_server_client.close()
     except Exception as e:
-        writer.write(error_message("Exception occurred"))
+        outbox.extend(error_message("Exception occurred"))
 
 
 async def handle_client(reader, writer):
     """Handle a single client connection."""
+    reader, writer = capture.wrap_streams(reader, writer)
     client_address = writer.get_extra_info("peername")
-    print(f"Connection from {client_address}")
+    logger.info("Connection from %s", client_address)
+    conn_log = log.for_connection(logger, client_address)
 
     data_buffer = b""
     # state is a client specific
@@ -263,29 +287,30 @@ async def handle_client(reader, writer):
     try:
         while True:
             # Receive data from the client (up to 4096 bytes)
-            print(f"reading data for {client_address} ...")
+            conn_log.debug("reading data for %s ...", client_address)
             data = await reader.read(4096)
-            print(f"finished reading data for {client_address}")
+            conn_log.debug("finished reading data for %s", client_address)
 
             # If no data received, client has closed the connection
             if not data:
-                print(f"Client {client_address} disconnected")
+                conn_log.info("Client %s disconnected", client_address)
                 break
 
-            print(f"Received from {client_address}: {data.hex(' ')}")
+            conn_log.debug("Received from %s: %s", client_address, log.Hex(data))
 
             data_buffer += data
 
-            # process all messages in data_buffer
+            # process all messages in data_buffer, queueing reply parts
+            outbox = []
             while True:
                 if len(data_buffer) < 5:
                     break
                 message_len, _ = parse_u32(data_buffer, 1)
                 if message_len > 1000000:
                     if not state["server_hello"]:
-                        writer.write(hello_message("pestcontrol", 1))
+                        outbox.extend(hello_message("pestcontrol", 1))
                         state["server_hello"] = True
-                    writer.write(error_message("Message too long"))
+                    outbox.extend(error_message("Message too long"))
                     break
                 if len(data_buffer) < message_len:
                     break
@@ -293,21 +318,26 @@ async def handle_client(reader, writer):
                 data_buffer = data_buffer[message_len:]
 
                 # Process message atomically (no await inside)
-                process_message(current_message, writer, state)
+                process_message(current_message, outbox, state, conn_log)
 
-            # Drain the writer after processing all messages
+            # Hand every queued reply's parts to one writelines call (a single
+            # join on 3.11, a vectored sendmsg on 3.12+), then drain
+            if outbox:
+                writer.writelines(outbox)
             await writer.drain()
     except asyncio.CancelledError:
         # Task cancellations are expected during shutdown; surface them explicitly for debugging
-        print(f"Connection task for {client_address} cancelled")
+        conn_log.warning("Connection task for %s cancelled", client_address)
         raise
     except Exception as e:
-        print(f"Error handling client {client_address}: {type(e).__name__}: {e!r}")
+        conn_log.error(
+            "Error handling client %s: %s: %r", client_address, type(e).__name__, e
+        )
     finally:
-        print(f"Closing writer for {client_address}...")
+        conn_log.debug("Closing writer for %s...", client_address)
         writer.close()
         await writer.wait_closed()
-        print(f"Writer closed for {client_address}")
+        conn_log.debug("Writer closed for %s", client_address)
 
 
 if __name__ == "__main__":
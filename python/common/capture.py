@@ -0,0 +1,196 @@
+"""
+Opt-in traffic capture for the Python servers.
+
+Set CAPTURE_FILE and every connection's inbound chunks and outbound writes are
+appended to that file with timestamps. When it is unset `wrap_socket` and
+`wrap_streams` hand back what they were given, so the handlers run untouched.
+Replay a trace against a server with common/replay.py.
+
+Records are flushed to disk every FLUSH_INTERVAL seconds and when the server
+exits, including on SIGTERM, so a running or killed server leaves a usable
+trace behind.
+
+Trace format: MAGIC, then records of RECORD (kind, connection id, seconds
+since the capture started, payload length) followed by the payload.
+"""
+
+import atexit
+import itertools
+import logging
+import os
+import signal
+import struct
+import sys
+import threading
+import time
+
+CAPTURE_FILE_ENV = "CAPTURE_FILE"
+FLUSH_INTERVAL = 1.0  # seconds between flushes of the trace file
+
+MAGIC = b"PHTRACE1"
+RECORD = struct.Struct("<BIdI")
+OPEN, INBOUND, OUTBOUND, CLOSE = range(4)
+
+logger = logging.getLogger("capture")
+
+_trace = None
+
+
+class TraceWriter:
+    """Appends records from any number of connections to one trace file."""
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.started = time.perf_counter()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        flusher.start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(FLUSH_INTERVAL):
+            with self._lock:
+                if not self.file.closed:
+                    self.file.flush()
+
+    def open_connection(self) -> int:
+        conn_id = next(self._ids)
+        self.record(OPEN, conn_id)
+        return conn_id
+
+    def record(self, kind, conn_id, data=b""):
+        offset = time.perf_counter() - self.started
+        with self._lock:
+            if self.file.closed:
+                return
+            self.file.write(RECORD.pack(kind, conn_id, offset, len(data)))
+            self.file.write(data)
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            self.file.close()
+
+
+class CapturedSocket:
+    """Socket proxy recording what `recv` returns and what `sendall` sends."""
+
+    def __init__(self, sock, trace):
+        self._sock = sock
+        self._trace = trace
+        self._conn_id = trace.open_connection()
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._trace.record(CLOSE, self._conn_id)
+        return self._sock.__exit__(exc_type, exc_val, exc_tb)
+
+    def recv(self, bufsize, *args):
+        data = self._sock.recv(bufsize, *args)
+        if data:
+            self._trace.record(INBOUND, self._conn_id, data)
+        return data
+
+    def sendall(self, data, *args):
+        self._trace.record(OUTBOUND, self._conn_id, data)
+        return self._sock.sendall(data, *args)
+
+
+class CapturedReader:
+    """StreamReader proxy recording what `read` returns."""
+
+    def __init__(self, reader, trace, conn_id):
+        self._reader = reader
+        self._trace = trace
+        self._conn_id = conn_id
+
+    def __getattr__(self, name):
+        return getattr(self._reader, name)
+
+    async def read(self, n=-1):
+        data = await self._reader.read(n)
+        if data:
+            self._trace.record(INBOUND, self._conn_id, data)
+        return data
+
+
+class CapturedWriter:
+    """StreamWriter proxy recording what `write`/`writelines` send."""
+
+    def __init__(self, writer, trace, conn_id):
+        self._writer = writer
+        self._trace = trace
+        self._conn_id = conn_id
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+    def write(self, data):
+        self._trace.record(OUTBOUND, self._conn_id, data)
+        self._writer.write(data)
+
+    def writelines(self, data):
+        self._trace.record(OUTBOUND, self._conn_id, b"".join(data))
+        self._writer.writelines(data)
+
+    def close(self):
+        self._trace.record(CLOSE, self._conn_id)
+        self._writer.close()
+
+
+def install():
+    """Start capturing to CAPTURE_FILE if it is set; otherwise do nothing."""
+    global _trace
+    path = os.environ.get(CAPTURE_FILE_ENV)
+    if not path or _trace is not None:
+        return False
+    _trace = TraceWriter(path)
+    atexit.register(_trace.close)
+    # SIGTERM normally skips atexit; turn it into a clean exit so the trace
+    # is closed, unless the server already handles SIGTERM itself
+    if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logger.info("Capturing traffic to %s", path)
+    return True
+
+
+def wrap_socket(sock):
+    """Return sock, recorded when capture is on."""
+    if _trace is None:
+        return sock
+    return CapturedSocket(sock, _trace)
+
+
+def wrap_streams(reader, writer):
+    """Return (reader, writer), recorded when capture is on."""
+    if _trace is None:
+        return reader, writer
+    conn_id = _trace.open_connection()
+    return (
+        CapturedReader(reader, _trace, conn_id),
+        CapturedWriter(writer, _trace, conn_id),
+    )
+
+
+def read_trace(path):
+    """Load a trace as {connection id: [(kind, offset, payload), ...]}."""
+    connections = {}
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a traffic trace")
+        while header := f.read(RECORD.size):
+            if len(header) < RECORD.size:
+                break  # truncated by a crash; keep what was complete
+            kind, conn_id, offset, length = RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                break
+            connections.setdefault(conn_id, []).append((kind, offset, data))
+    return connections
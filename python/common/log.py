@@ -0,0 +1,170 @@
+"""
+Logging pipeline shared by the Python servers.
+
+Handlers log through the standard `logging` module, but records are handed to
+a bounded queue and written to stdout by a background listener thread, so a
+slow stdout never blocks a connection handler. When the queue is full records
+are dropped and counted instead. At exit the writer gets SHUTDOWN_TIMEOUT
+seconds to drain the queue before the dropped count is reported.
+
+Messages use %-style arguments, so no string is built for a disabled level.
+Records tagged with a connection (see `for_connection`) are additionally
+sampled: each connection gets at most LOG_SAMPLE_RATE records per second at
+levels below WARNING.
+
+    LOG_LEVEL        DEBUG, INFO, WARNING, ... (default INFO)
+    LOG_SAMPLE_RATE  records per connection per second (default 100, 0 = off)
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+LOG_LEVEL_ENV = "LOG_LEVEL"
+LOG_SAMPLE_RATE_ENV = "LOG_SAMPLE_RATE"
+DEFAULT_LEVEL = "INFO"
+DEFAULT_SAMPLE_RATE = 100
+QUEUE_SIZE = 10000
+SHUTDOWN_TIMEOUT = 5.0  # seconds to wait for the writer to drain at exit
+FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_listener = None
+_queue_handler = None
+
+
+class Hex:
+    """Lazily renders bytes as a spaced hex dump when the record is formatted."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return self.data.hex(" ")
+
+
+class ConnectionSampler(logging.Filter):
+    """Lets at most `rate` records per second through for each connection.
+
+    Records without a `conn` attribute, and WARNING or above, always pass.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+        self._counts = {}
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        conn = getattr(record, "conn", None)
+        if conn is None or record.levelno >= logging.WARNING:
+            return True
+
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1:
+                self._counts.clear()
+                self._window_start = now
+            count = self._counts.get(conn, 0) + 1
+            self._counts[conn] = count
+            if count > self.rate:
+                self.dropped += 1
+                return False
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that drops records instead of blocking when full."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """A QueueListener whose `stop` waits for room in a full queue, but not forever.
+
+    The stock listener queues its stop sentinel with `put_nowait`, which fails
+    exactly when stdout is slow and the queue has filled up.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel, timeout=SHUTDOWN_TIMEOUT)
+
+    def stop(self):
+        """Drain the queue and stop the writer; return True if it finished."""
+        try:
+            self.enqueue_sentinel()
+        except queue.Full:
+            pass  # the writer is stuck; still give it a last chance below
+        self._thread.join(SHUTDOWN_TIMEOUT)
+        finished = not self._thread.is_alive()
+        self._thread = None
+        return finished
+
+
+def setup():
+    """Route the root logger through the background writer. Safe to call twice."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    level = os.environ.get(LOG_LEVEL_ENV, DEFAULT_LEVEL).upper()
+    rate = int(os.environ.get(LOG_SAMPLE_RATE_ENV, DEFAULT_SAMPLE_RATE))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(FORMAT))
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+    if rate > 0:
+        _queue_handler.addFilter(ConnectionSampler(rate))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+
+    _listener = DrainingQueueListener(_queue_handler.queue, stream_handler)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Flush the queue, stop the writer thread and report dropped records."""
+    global _listener
+    if _listener is None:
+        return
+    finished = _listener.stop()
+    _listener = None
+
+    dropped = _queue_handler.dropped + sum(
+        f.dropped for f in _queue_handler.filters if isinstance(f, ConnectionSampler)
+    )
+    if not finished:
+        # Whatever the stuck writer never got to is lost as well
+        dropped += _queue_handler.queue.qsize()
+    if dropped:
+        print(f"{dropped} log records dropped", file=sys.stderr)
+
+
+def get_logger(name):
+    """Return the named logger; call `setup` once at startup to attach output."""
+    return logging.getLogger(name)
+
+
+def for_connection(logger, address):
+    """Return a logger whose records are sampled per `address`."""
+    return logging.LoggerAdapter(logger, {"conn": address})
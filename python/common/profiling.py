@@ -0,0 +1,229 @@
+"""
+Opt-in profiling hooks shared by the Python servers.
+
+Nothing is installed unless PROFILE_DIR is set in the environment. Once
+installed, the hooks are plain signal handlers, so they cost nothing until a
+signal arrives:
+
+    SIGUSR1  capture a cProfile for PROFILE_SECONDS and write a .prof file
+    SIGUSR2  dump per-connection buffer sizes right away, then trace
+             allocations for PROFILE_SECONDS and write the top sites
+
+Per-connection buffers are found by inspecting the locals of live
+`handle_client` frames (threads and asyncio tasks alike), so the handlers do
+not have to do any bookkeeping of their own.
+
+Before Python 3.12 a cProfile only sees the thread that enabled it. A capture
+then covers the thread that received the signal and the threads started during
+the window; connection threads that were already running are not profiled.
+Each thread drops its own profiler at its first event after the window closes.
+"""
+
+import asyncio
+import cProfile
+import logging
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+PROFILE_DIR_ENV = "PROFILE_DIR"
+PROFILE_SECONDS_ENV = "PROFILE_SECONDS"
+DEFAULT_SECONDS = 10
+
+HANDLER_NAME = "handle_client"
+BUFFER_NAMES = ("data_buffer", "the_rest")
+TOP_ALLOCATIONS = 25
+
+logger = logging.getLogger("profiling")
+
+# Reentrant because the signal handlers take it on the main thread, and a
+# second signal can run its handler while the first one still holds it
+_lock = threading.RLock()
+_profilers: list[cProfile.Profile] = []
+# Each thread's profiler stays referenced here, because the hook that _timer
+# removes must not drop the last reference while its callback is running
+_local = threading.local()
+_profiling = False
+_tracing = False
+_out_dir = None
+_seconds = DEFAULT_SECONDS
+
+
+def install():
+    """Install the signal handlers if PROFILE_DIR is set; otherwise do nothing."""
+    global _out_dir, _seconds
+    out_dir = os.environ.get(PROFILE_DIR_ENV)
+    if not out_dir or not hasattr(signal, "SIGUSR1"):
+        return False
+
+    os.makedirs(out_dir, exist_ok=True)
+    _out_dir = out_dir
+    _seconds = float(os.environ.get(PROFILE_SECONDS_ENV, DEFAULT_SECONDS))
+    signal.signal(signal.SIGUSR1, lambda signum, frame: start_profile())
+    signal.signal(signal.SIGUSR2, lambda signum, frame: start_allocation_trace())
+    logger.info(
+        "Profiling hooks installed (pid %d): "
+        "SIGUSR1 = cProfile, SIGUSR2 = buffers + tracemalloc, output in %s",
+        os.getpid(),
+        out_dir,
+    )
+    return True
+
+
+def _output_path(kind, suffix):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(_out_dir, f"{kind}-{os.getpid()}-{stamp}.{suffix}")
+
+
+def _timer():
+    # cProfile calls its timer on every event in the thread it profiles, which
+    # makes it the one place where that thread can remove its own profile hook
+    # once the window has closed (before 3.12 no other thread can)
+    if not _profiling:
+        sys.setprofile(None)
+    return time.perf_counter()
+
+
+def _new_profiler():
+    if sys.version_info < (3, 12):
+        return cProfile.Profile(_timer)
+    return cProfile.Profile()
+
+
+def _enable_in_thread(frame, event, arg):
+    # Runs once as the profile hook of a thread started during the capture
+    # window, and swaps itself for a per-thread cProfile.
+    sys.setprofile(None)
+    profiler = _new_profiler()
+    with _lock:
+        if not _profiling:
+            return
+        _profilers.append(profiler)
+    _local.profiler = profiler
+    profiler.enable()
+
+
+def start_profile():
+    """Start a cProfile capture that stops itself after PROFILE_SECONDS."""
+    global _profiling
+    with _lock:
+        if _profiling:
+            return
+        _profiling = True
+        profiler = _new_profiler()
+        _profilers.append(profiler)
+
+    # From 3.12 on cProfile is built on sys.monitoring and already sees every
+    # thread. Before that it only sees the thread that enabled it, so the
+    # connection threads started during the window get a profiler of their own.
+    if sys.version_info < (3, 12):
+        threading.setprofile(_enable_in_thread)
+    _local.profiler = profiler
+    profiler.enable()
+
+    timer = threading.Timer(_seconds, stop_profile)
+    timer.daemon = True
+    timer.start()
+
+
+def stop_profile():
+    """Stop the running capture and write the merged stats to a .prof file."""
+    global _profiling
+    with _lock:
+        if not _profiling:
+            return
+        _profiling = False
+        profilers = _profilers[:]
+        _profilers.clear()
+    threading.setprofile(None)
+
+    # Before 3.12 disable() only affects the calling thread; the profiled
+    # threads unhook themselves through _timer now that _profiling is False
+    stats = None
+    for profiler in profilers:
+        profiler.disable()
+        if stats is None:
+            stats = pstats.Stats(profiler)
+        else:
+            stats.add(profiler)
+
+    path = _output_path("profile", "prof")
+    stats.dump_stats(path)
+    logger.info("Profile written to %s", path)
+
+
+def start_allocation_trace():
+    """Dump connection buffers, then trace allocations for PROFILE_SECONDS."""
+    global _tracing
+    dump_buffers()
+    with _lock:
+        if _tracing:
+            return
+        _tracing = True
+    tracemalloc.start()
+
+    timer = threading.Timer(_seconds, stop_allocation_trace)
+    timer.daemon = True
+    timer.start()
+
+
+def stop_allocation_trace():
+    """Snapshot the traced allocations, write the top sites and stop tracing."""
+    global _tracing
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    with _lock:
+        _tracing = False
+
+    snapshot = snapshot.filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    top = snapshot.statistics("lineno")
+    path = _output_path("tracemalloc", "txt")
+    with open(path, "w") as f:
+        f.write(f"Top {TOP_ALLOCATIONS} allocation sites over {_seconds}s\n")
+        for stat in top[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+    logger.info("Allocation trace written to %s", path)
+
+
+def _handler_frames():
+    """Yield the frames of every live handle_client, threaded or asyncio."""
+    for frame in sys._current_frames().values():
+        while frame is not None:
+            if frame.f_code.co_name == HANDLER_NAME:
+                yield frame
+                break
+            frame = frame.f_back
+
+    try:
+        tasks = asyncio.all_tasks()
+    except RuntimeError:
+        return
+    for task in tasks:
+        frame = getattr(task.get_coro(), "cr_frame", None)
+        if frame is not None and frame.f_code.co_name == HANDLER_NAME:
+            yield frame
+
+
+def dump_buffers():
+    """Write the size of each connection's pending input buffers to a file."""
+    path = _output_path("buffers", "txt")
+    total = 0
+    with open(path, "w") as f:
+        for frame in _handler_frames():
+            local_vars = frame.f_locals
+            address = local_vars.get("client_address")
+            sizes = {
+                name: len(local_vars[name])
+                for name in BUFFER_NAMES
+                if name in local_vars
+            }
+            total += sum(sizes.values())
+            f.write(f"{address} {sizes}\n")
+        f.write(f"total {total}\n")
+    logger.info("Connection buffers written to %s", path)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Traffic Replayer
+Drives a local server with the connections in a capture trace, either at the
+recorded timing or flat out, checks every response against the recorded one
+and reports throughput and the latency of the matching responses.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.capture import INBOUND, OPEN, OUTBOUND, read_trace
+
+HOST = "127.0.0.1"  # Replay against a local server by default
+PORT = 8080  # Server port
+
+
+class ReplayResult:
+    """Per-connection counters collected while replaying."""
+
+    def __init__(self):
+        self.latencies = []
+        self.chunks = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.mismatches = 0
+        self.timeouts = 0
+        self.error = None
+
+
+def exchanges(records):
+    """Split one connection's records into (offset, inbound, expected reply).
+
+    The expected reply is everything the server sent before the next inbound
+    chunk. Replies sent before any input get an empty inbound chunk.
+    """
+    steps = []
+    offset = 0.0
+    inbound = b""
+    expected = bytearray()
+    for kind, record_offset, data in records:
+        if kind == OPEN:
+            offset = record_offset
+        elif kind == INBOUND:
+            if inbound or expected:
+                steps.append((offset, inbound, bytes(expected)))
+            offset, inbound, expected = record_offset, data, bytearray()
+        elif kind == OUTBOUND:
+            expected += data
+    if inbound or expected:
+        steps.append((offset, inbound, bytes(expected)))
+    return steps
+
+
+def receive_up_to(sock, n):
+    """Receive n bytes, or fewer if the server closes or goes quiet.
+
+    Returns (data, timed_out).
+    """
+    buffer = bytearray()
+    try:
+        while len(buffer) < n:
+            data = sock.recv(n - len(buffer))
+            if not data:
+                break
+            buffer += data
+    except socket.timeout:
+        return bytes(buffer), True
+    return bytes(buffer), False
+
+
+def replay_connection(records, args, origin, result):
+    """Replay one connection; recorded offsets are scheduled from origin."""
+    steps = exchanges(records)
+    if not steps:
+        return
+    try:
+        if not args.flat:
+            time.sleep(max(0.0, origin + records[0][1] - time.perf_counter()))
+        with socket.create_connection((args.host, args.port)) as sock:
+            sock.settimeout(args.timeout)
+            for offset, inbound, expected in steps:
+                if not args.flat:
+                    time.sleep(max(0.0, origin + offset - time.perf_counter()))
+
+                sent_at = time.perf_counter()
+                if inbound:
+                    sock.sendall(inbound)
+                reply, timed_out = receive_up_to(sock, len(expected))
+                received_at = time.perf_counter()
+
+                result.chunks += 1
+                result.bytes_sent += len(inbound)
+                result.bytes_received += len(reply)
+                if reply != expected:
+                    result.mismatches += 1
+                    # A short reply that ran into --timeout would only measure
+                    # the timeout, so it is counted instead of timed
+                    if timed_out:
+                        result.timeouts += 1
+                elif expected:
+                    result.latencies.append(received_at - sent_at)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("trace", help="file written with CAPTURE_FILE set")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument(
+        "--flat", action="store_true", help="ignore recorded timing, go flat out"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=5.0, help="seconds to wait for a reply"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    connections = read_trace(args.trace)
+
+    # Offsets count from server start; rebase them to the first connection so
+    # the idle time before it is neither replayed nor measured
+    first_open = min(
+        (
+            offset
+            for records in connections.values()
+            for kind, offset, _ in records
+            if kind == OPEN
+        ),
+        default=0.0,
+    )
+
+    results = {conn_id: ReplayResult() for conn_id in connections}
+    started = time.perf_counter()
+    workers = [
+        threading.Thread(
+            target=replay_connection,
+            args=(records, args, started - first_open, results[conn_id]),
+            daemon=True,
+        )
+        for conn_id, records in connections.items()
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for r in results.values() for latency in r.latencies)
+    chunks = sum(r.chunks for r in results.values())
+    bytes_sent = sum(r.bytes_sent for r in results.values())
+    bytes_received = sum(r.bytes_received for r in results.values())
+    mismatches = sum(r.mismatches for r in results.values())
+    timeouts = sum(r.timeouts for r in results.values())
+
+    mode = "flat out" if args.flat else "recorded timing"
+    print(
+        f"Replayed {len(connections)} connections ({mode}) -> {args.host}:{args.port}"
+    )
+    print(f"Elapsed:     {elapsed:.3f}s")
+    if elapsed > 0:
+        print(
+            f"Throughput:  {chunks / elapsed:,.0f} chunks/s, "
+            f"{(bytes_sent + bytes_received) / elapsed / 1_000_000:,.2f} MB/s"
+        )
+    if latencies:
+        print(
+            f"Latency (us): mean {sum(latencies) / len(latencies) * 1e6:.0f}  "
+            f"p50 {percentile(latencies, 50) * 1e6:.0f}  "
+            f"p99 {percentile(latencies, 99) * 1e6:.0f}  "
+            f"max {latencies[-1] * 1e6:.0f}"
+        )
+    print(
+        f"Responses:   {chunks - mismatches}/{chunks} match the recording, "
+        f"{timeouts} timed out after {args.timeout}s"
+    )
+    for conn_id, result in results.items():
+        if result.error:
+            print(f"Connection {conn_id} failed: {result.error}")
+
+
+if __name__ == "__main__":
+    main()